@@ -1,19 +1,232 @@
 import argparse
+import functools
 import os
+import sys
 import json
+import threading
+import time
+from importlib.util import find_spec
 import requests # Ensure this is installed: pip install requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx # Optional, HTTP/2 transport with streamed responses: pip install "httpx[http2]"
+except ImportError:
+    httpx = None
+
+try:
+    import orjson # Optional, much faster JSON encoding/decoding: pip install orjson
+except ImportError:
+    orjson = None
 
 # ANSI color codes for terminal output
-class Colors:
-    RESET = '\033[0m'
-    RED = '\033[91m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    BLUE = '\033[94m'
-    MAGENTA = '\033[95m'
-    CYAN = '\033[96m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
+RESET = '\033[0m'
+RED = '\033[91m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+BLUE = '\033[94m'
+MAGENTA = '\033[95m'
+CYAN = '\033[96m'
+BOLD = '\033[1m'
+UNDERLINE = '\033[4m'
+
+# Drop the escape sequences when output is piped or redirected to a file
+if not sys.stdout.isatty():
+    RESET = RED = GREEN = YELLOW = BLUE = MAGENTA = CYAN = BOLD = UNDERLINE = ''
+
+# Colored labels used by the report, built once instead of per printed line
+_VULN_HEADER = f"{BOLD}{GREEN}Vulnerability "
+_DESCRIPTION_LABEL = f"{CYAN}  Description:{RESET}"
+_METASPLOIT_LABEL = f"{MAGENTA}  Metasploit Modules:{RESET}"
+_TOOLS_LABEL = f"{BLUE}  Other Suggested Tools & Formats:{RESET}"
+_EXPLOIT_LINKS_LABEL = f"{YELLOW}  Exploit Links:{RESET}"
+
+# Prompt sent around the file content. The content goes in its own part between these two
+# (Gemini concatenates parts), so it is never copied into one big prompt string.
+_PROMPT_PREFIX = """
+Analyze the following content and {query}.
+Provide your analysis in a structured JSON format. The JSON should be an array of vulnerability objects.
+Each vulnerability object must contain:
+- "name": A concise name for the vulnerability.
+- "description": A short, parsed explanation of the vulnerability.
+- "metasploit_modules": An array of suggested Metasploit module paths (e.g., "exploit/windows/smb/ms17_010_eternalblue"). If none, use an empty array.
+- "exploit_links": An array of relevant URLs for exploit details or PoCs. If none, use an empty array.
+- "other_tools_and_formats": An array of other relevant tools and their likely output formats (e.g., "Nessus (HTML, XML, CSV)", "Nmap (XML, Nmap Script Output)", "Nikto (TXT, HTML)"). If none, use an empty array.
+
+--- Content Start ---
+"""
+_PROMPT_SUFFIX = """
+--- Content End ---
+"""
+
+# Asks Gemini for JSON matching the structure described in the prompt; built once per process
+_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "name": {"type": "STRING"},
+                "description": {"type": "STRING"},
+                "metasploit_modules": {
+                    "type": "ARRAY",
+                    "items": {"type": "STRING"}
+                },
+                "exploit_links": {
+                    "type": "ARRAY",
+                    "items": {"type": "STRING"}
+                },
+                "other_tools_and_formats": {
+                    "type": "ARRAY",
+                    "items": {"type": "STRING"}
+                }
+            },
+            "required": ["name", "description", "metasploit_modules", "exploit_links", "other_tools_and_formats"]
+        }
+    }
+}
+
+API_KEY_FILE_PATH = "/usr/share/vortexai/apikey.txt"
+API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+
+# HTTP policy shared by both backends: retry transient failures with exponential backoff and allow
+# a long wait for the first byte, since Gemini can take minutes on large scan files
+_RETRY_TOTAL = 3
+_RETRY_BACKOFF_FACTOR = 0.5
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_CONNECT_TIMEOUT = 10.0
+_READ_TIMEOUT = 300.0
+
+# Only the backend that is actually used gets created: httpx when installed (over HTTP/2 if the
+# 'h2' package is available), otherwise a pooled requests session. Both keep the TLS connection alive.
+_CLIENT = None
+_SESSION = None
+if httpx is not None:
+    # No explicit transport: passing one would stop httpx from honouring HTTPS_PROXY/ALL_PROXY/NO_PROXY
+    _CLIENT = httpx.Client(
+        http2=find_spec("h2") is not None,
+        timeout=httpx.Timeout(_READ_TIMEOUT, connect=_CONNECT_TIMEOUT),
+    )
+else:
+    _SESSION = requests.Session()
+    _SESSION.mount("https://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=_RETRY_TOTAL,
+            backoff_factor=_RETRY_BACKOFF_FACTOR,
+            status_forcelist=sorted(_RETRY_STATUSES),
+            allowed_methods=frozenset({"POST"}),
+        ),
+    ))
+
+# Errors raised by either HTTP backend for connection problems and 4xx/5xx responses
+_HTTP_ERRORS = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+def _retry_delay(attempt, retry_after):
+    """
+    Seconds to wait before retrying after failed attempt number `attempt` (0-based), matching
+    urllib3's Retry: a numeric Retry-After header wins, otherwise the first retry is immediate
+    and later ones back off exponentially.
+    """
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    if attempt == 0:
+        return 0.0
+    return _RETRY_BACKOFF_FACTOR * (2 ** attempt)
+
+def _post_json(url, headers, body):
+    """
+    POSTs the JSON `body` (bytes) to `url` and returns the raw response body as bytes.
+    Uses the streaming httpx client when available, otherwise the pooled requests session;
+    both retry connection failures and the statuses in _RETRY_STATUSES and share the same timeouts.
+    Raises one of _HTTP_ERRORS on connection failures or HTTP error statuses.
+    """
+    if _CLIENT is None:
+        response = _SESSION.post(url, headers=headers, data=body, timeout=(_CONNECT_TIMEOUT, _READ_TIMEOUT))
+        response.raise_for_status()
+        return response.content
+
+    for attempt in range(_RETRY_TOTAL + 1):
+        try:
+            with _CLIENT.stream("POST", url, headers=headers, content=body) as response:
+                if response.status_code in _RETRY_STATUSES and attempt < _RETRY_TOTAL:
+                    delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+                else:
+                    response.raise_for_status()
+                    data = bytearray()
+                    for chunk in response.iter_bytes(8192):
+                        data += chunk
+                    return bytes(data)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if attempt == _RETRY_TOTAL:
+                raise
+            delay = _retry_delay(attempt, None)
+        time.sleep(delay)
+
+def _json_dumps(obj, indent=False):
+    """Serializes obj to UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+def _json_loads(data):
+    """Parses JSON from str/bytes, using orjson when available. Both raise json.JSONDecodeError on bad input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+@functools.lru_cache(maxsize=None)
+def _read_api_key_file(path, mtime_ns, size, noatime):
+    """
+    Reads and strips the API key file. Cached per (path, mtime, size) so an unchanged file is only read once.
+    `noatime` requests O_NOATIME, which the kernel only allows for the file's owner.
+    """
+    fd = os.open(path, os.O_RDONLY | (getattr(os, "O_NOATIME", 0) if noatime else 0))
+    try:
+        if hasattr(os, "posix_fadvise"):
+            # One-shot tiny read: tell the kernel not to keep it around in the page cache
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_NOREUSE)
+        # Asking for one byte more than the stat'ed size reads the whole file in a single call;
+        # only a file that grew since the stat needs more reads
+        data = os.read(fd, size + 1)
+        if len(data) > size:
+            while chunk := os.read(fd, 4096):
+                data += chunk
+    finally:
+        os.close(fd)
+    return data.decode('utf-8').strip()
+
+def _load_api_key(path=API_KEY_FILE_PATH):
+    """
+    Returns the API key stored in `path`, re-reading the file only when it changes.
+    Raises FileNotFoundError/IsADirectoryError if `path` is not a regular file.
+    """
+    st = os.stat(path)
+    # The installer creates the file as root, so most users cannot use O_NOATIME; don't try a doomed open
+    noatime = hasattr(os, "geteuid") and st.st_uid == os.geteuid()
+    return _read_api_key_file(path, st.st_mtime_ns, st.st_size, noatime)
+
+def _write_log(log_file_path, data, errors):
+    """
+    Writes `data` as indented JSON to `log_file_path` via a temporary file and an atomic rename,
+    so a partially written log is never left behind. Any exception is appended to `errors`.
+    """
+    # The pid keeps concurrent runs on the same results file from sharing a temp file; unlike
+    # tempfile's 0600 files, open() keeps the log's usual umask-based permissions
+    tmp_path = f"{log_file_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'xb', buffering=1 << 20) as f:
+            f.write(_json_dumps(data, indent=True))
+        os.replace(tmp_path, log_file_path)
+    except Exception as e:
+        errors.append(e)
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
 
 def main():
     """
@@ -40,167 +253,144 @@ def main():
 
     if not api_key:
         # Fallback: Attempt to read API key from a local file
-        api_key_file_path = "/usr/share/vortexai/apikey.txt"
-        print(f"{Colors.YELLOW}GEMINI_API_KEY environment variable not set. Checking '{api_key_file_path}'...{Colors.RESET}")
+        api_key_file_path = API_KEY_FILE_PATH
+        print(f"{YELLOW}GEMINI_API_KEY environment variable not set. Checking '{api_key_file_path}'...{RESET}")
         try:
-            if os.path.exists(api_key_file_path) and os.path.isfile(api_key_file_path):
-                with open(api_key_file_path, 'r', encoding='utf-8') as f:
-                    api_key = f.read().strip()
-                if not api_key:
-                    print(f"{Colors.RED}Error: API key file '{api_key_file_path}' is empty.{Colors.RESET}")
-                    return
-                else:
-                    print(f"{Colors.GREEN}API key successfully loaded from '{api_key_file_path}'.{Colors.RESET}")
-            else:
-                print(f"{Colors.RED}Error: API key file not found at '{api_key_file_path}'.{Colors.RESET}")
-                print(f"{Colors.YELLOW}Please set GEMINI_API_KEY environment variable OR create '{api_key_file_path}' with your API key.{Colors.RESET}")
+            api_key = _load_api_key(api_key_file_path)
+            if not api_key:
+                print(f"{RED}Error: API key file '{api_key_file_path}' is empty.{RESET}")
                 return
+            else:
+                print(f"{GREEN}API key successfully loaded from '{api_key_file_path}'.{RESET}")
+        except (FileNotFoundError, IsADirectoryError):
+            print(f"{RED}Error: API key file not found at '{api_key_file_path}'.{RESET}")
+            print(f"{YELLOW}Please set GEMINI_API_KEY environment variable OR create '{api_key_file_path}' with your API key.{RESET}")
+            return
         except Exception as e:
-            print(f"{Colors.RED}Error reading API key from file '{api_key_file_path}': {e}{Colors.RESET}")
+            print(f"{RED}Error reading API key from file '{api_key_file_path}': {e}{RESET}")
             return
 
     if not api_key: # Final check if key is still not found/loaded
-        print(f"{Colors.RED}Fatal Error: No Gemini API key found. Exiting.{Colors.RESET}")
-        print(f"{Colors.YELLOW}Please set GEMINI_API_KEY environment variable OR create /usr/share/vortexai/apikey.txt with your API key.{Colors.RESET}")
+        print(f"{RED}Fatal Error: No Gemini API key found. Exiting.{RESET}")
+        print(f"{YELLOW}Please set GEMINI_API_KEY environment variable OR create /usr/share/vortexai/apikey.txt with your API key.{RESET}")
         return
 
     # --- 2. Read the content from the specified file ---
     file_path = args.results_file
     if not os.path.exists(file_path):
-        print(f"{Colors.RED}Error: File not found at '{file_path}'{Colors.RESET}")
+        print(f"{RED}Error: File not found at '{file_path}'{RESET}")
         return
     if not os.path.isfile(file_path):
-        print(f"{Colors.RED}Error: Path '{file_path}' is not a file.{Colors.RESET}")
+        print(f"{RED}Error: Path '{file_path}' is not a file.{RESET}")
         return
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # A large buffer keeps the number of read syscalls low for big scan outputs
+        with open(file_path, 'r', encoding='utf-8', buffering=1 << 20) as f:
             file_content = f.read()
     except Exception as e:
-        print(f"{Colors.RED}Error reading file '{file_path}': {e}{Colors.RESET}")
+        print(f"{RED}Error reading file '{file_path}': {e}{RESET}")
         return
 
     # --- 3. Prepare the prompt for the AI and define the expected JSON structure ---
-    prompt = f"""
-Analyze the following content and {args.query}.
-Provide your analysis in a structured JSON format. The JSON should be an array of vulnerability objects.
-Each vulnerability object must contain:
-- "name": A concise name for the vulnerability.
-- "description": A short, parsed explanation of the vulnerability.
-- "metasploit_modules": An array of suggested Metasploit module paths (e.g., "exploit/windows/smb/ms17_010_eternalblue"). If none, use an empty array.
-- "exploit_links": An array of relevant URLs for exploit details or PoCs. If none, use an empty array.
-- "other_tools_and_formats": An array of other relevant tools and their likely output formats (e.g., "Nessus (HTML, XML, CSV)", "Nmap (XML, Nmap Script Output)", "Nikto (TXT, HTML)"). If none, use an empty array.
-
---- Content Start ---
-{file_content}
---- Content End ---
-"""
+    prompt_prefix = _PROMPT_PREFIX.format(query=args.query)
 
-    print(f"{Colors.CYAN}Sending structured query to Gemini AI. Please wait...{Colors.RESET}")
+    print(f"{CYAN}Sending structured query to Gemini AI. Please wait...{RESET}")
 
     # --- 4. Interact with the Gemini AI with a specific response schema ---
+    raw_response = b""
+    parsed_response = None
     try:
         chat_history = []
-        chat_history.append({"role": "user", "parts": [{"text": prompt}]})
-
-        generation_config = {
-            "responseMimeType": "application/json",
-            "responseSchema": {
-                "type": "ARRAY",
-                "items": {
-                    "type": "OBJECT",
-                    "properties": {
-                        "name": {"type": "STRING"},
-                        "description": {"type": "STRING"},
-                        "metasploit_modules": {
-                            "type": "ARRAY",
-                            "items": {"type": "STRING"}
-                        },
-                        "exploit_links": {
-                            "type": "ARRAY",
-                            "items": {"type": "STRING"}
-                        },
-                        "other_tools_and_formats": {
-                            "type": "ARRAY",
-                            "items": {"type": "STRING"}
-                        }
-                    },
-                    "required": ["name", "description", "metasploit_modules", "exploit_links", "other_tools_and_formats"]
-                }
-            }
-        }
+        chat_history.append({"role": "user", "parts": [
+            {"text": prompt_prefix},
+            {"text": file_content},
+            {"text": _PROMPT_SUFFIX},
+        ]})
 
         payload = {
             "contents": chat_history,
-            "generationConfig": generation_config
+            "generationConfig": _GENERATION_CONFIG
         }
         
-        apiUrl = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}" # Use loaded API key
+        # The key travels in a header so the URL stays constant (and out of logs/proxies)
+        headers = {'Content-Type': 'application/json', 'x-goog-api-key': api_key}
 
-        response = requests.post(apiUrl, headers={'Content-Type': 'application/json'}, data=json.dumps(payload))
-        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+        raw_response = _post_json(API_URL, headers, _json_dumps(payload)) # Raises for HTTP errors (4xx or 5xx)
 
-        result_text = response.json()["candidates"][0]["content"]["parts"][0]["text"]
-        ai_response_json = json.loads(result_text)
+        parsed_response = _json_loads(raw_response) # Parsed once; the error handlers below reuse it
+        result_text = parsed_response["candidates"][0]["content"]["parts"][0]["text"]
+        ai_response_json = _json_loads(result_text)
 
-        # --- Save raw JSON to a .log file ---
+        # --- Save raw JSON to a .log file (in the background, while the results are printed) ---
         log_file_path = file_path + ".log"
+        log_errors = []
+        log_writer = threading.Thread(target=_write_log, args=(log_file_path, ai_response_json, log_errors), daemon=True)
+        log_writer.start()
+
         try:
-            with open(log_file_path, 'w', encoding='utf-8') as f:
-                f.write(json.dumps(ai_response_json, indent=2))
-            print(f"{Colors.BLUE}Raw JSON response saved to: {log_file_path}{Colors.RESET}")
-        except Exception as e:
-            print(f"{Colors.YELLOW}Warning: Could not save JSON to log file {log_file_path}: {e}{Colors.RESET}")
+            # --- Print the AI's structured response in a non-JSON format ---
+            print(f"\n{GREEN}--- Gemini AI Vulnerability Analysis ---{RESET}")
+            if not isinstance(ai_response_json, list) or not ai_response_json:
+                print(f"{YELLOW}No vulnerabilities identified or structured response received.{RESET}")
+                return
 
+            # The report is assembled in memory and written with a single call instead of one print per line
+            buf = []
+            for i, vuln in enumerate(ai_response_json):
+                # Each field is looked up once; missing or empty values fall back to the defaults
+                name = vuln.get('name') or 'N/A'
+                description = vuln.get('description') or 'N/A'
+                metasploit_modules = vuln.get('metasploit_modules') or ()
+                other_tools_and_formats = vuln.get('other_tools_and_formats') or ()
+                exploit_links = vuln.get('exploit_links') or ()
 
-        # --- Print the AI's structured response in a non-JSON format ---
-        print(f"\n{Colors.GREEN}--- Gemini AI Vulnerability Analysis ---{Colors.RESET}")
-        if not ai_response_json:
-            print(f"{Colors.YELLOW}No vulnerabilities identified or structured response received.{Colors.RESET}")
-            return
+                buf.append(f"\n{_VULN_HEADER}{i+1}: {name}{RESET}\n")
+                buf.append(f"{_DESCRIPTION_LABEL} {description}\n")
 
-        for i, vuln in enumerate(ai_response_json):
-            print(f"\n{Colors.BOLD}{Colors.GREEN}Vulnerability {i+1}: {vuln.get('name', 'N/A')}{Colors.RESET}")
-            print(f"{Colors.CYAN}  Description:{Colors.RESET} {vuln.get('description', 'N/A')}")
+                if metasploit_modules:
+                    buf.append(f"{_METASPLOIT_LABEL}\n")
+                    for module in metasploit_modules:
+                        buf.append(f"    - {module}\n")
+                else:
+                    buf.append(f"{_METASPLOIT_LABEL} None suggested.\n")
 
-            metasploit_modules = vuln.get('metasploit_modules')
-            if metasploit_modules:
-                print(f"{Colors.MAGENTA}  Metasploit Modules:{Colors.RESET}")
-                for module in metasploit_modules:
-                    print(f"    - {module}")
-            else:
-                print(f"{Colors.MAGENTA}  Metasploit Modules:{Colors.RESET} None suggested.")
+                if other_tools_and_formats:
+                    buf.append(f"{_TOOLS_LABEL}\n")
+                    for tool_info in other_tools_and_formats:
+                        buf.append(f"    - {tool_info}\n")
+                else:
+                    buf.append(f"{_TOOLS_LABEL} None suggested.\n")
 
-            other_tools_and_formats = vuln.get('other_tools_and_formats')
-            if other_tools_and_formats:
-                print(f"{Colors.BLUE}  Other Suggested Tools & Formats:{Colors.RESET}")
-                for tool_info in other_tools_and_formats:
-                    print(f"    - {tool_info}")
-            else:
-                print(f"{Colors.BLUE}  Other Suggested Tools & Formats:{Colors.RESET} None suggested.")
+                if exploit_links:
+                    buf.append(f"{_EXPLOIT_LINKS_LABEL}\n")
+                    for link in exploit_links:
+                        buf.append(f"    - {link}\n")
+                else:
+                    buf.append(f"{_EXPLOIT_LINKS_LABEL} None provided.\n")
 
-            exploit_links = vuln.get('exploit_links')
-            if exploit_links:
-                print(f"{Colors.YELLOW}  Exploit Links:{Colors.RESET}")
-                for link in exploit_links:
-                    print(f"    - {link}")
+            buf.append(f"\n{GREEN}--- Analysis Complete ---{RESET}\n")
+            sys.stdout.write("".join(buf))
+            sys.stdout.flush()
+        finally:
+            log_writer.join()
+            if log_errors:
+                print(f"{YELLOW}Warning: Could not save JSON to log file {log_file_path}: {log_errors[0]}{RESET}")
             else:
-                print(f"{Colors.YELLOW}  Exploit Links:{Colors.RESET} None provided.")
-        
-        print(f"\n{Colors.GREEN}--- Analysis Complete ---{Colors.RESET}")
+                print(f"{BLUE}Raw JSON response saved to: {log_file_path}{RESET}")
 
 
-    except requests.exceptions.RequestException as req_err:
-        print(f"{Colors.RED}\nError communicating with Gemini API: {req_err}{Colors.RESET}")
-        print(f"{Colors.YELLOW}Please check your internet connection or API key.{Colors.RESET}")
+    except _HTTP_ERRORS as req_err:
+        print(f"{RED}\nError communicating with Gemini API: {req_err}{RESET}")
+        print(f"{YELLOW}Please check your internet connection or API key.{RESET}")
     except json.JSONDecodeError as json_err:
-        print(f"{Colors.RED}\nError parsing API response JSON: {json_err}{Colors.RESET}")
-        print(f"{Colors.YELLOW}Raw response: {response.text}{Colors.RESET}")
+        print(f"{RED}\nError parsing API response JSON: {json_err}{RESET}")
+        print(f"{YELLOW}Raw response: {raw_response.decode('utf-8', 'replace')}{RESET}")
     except KeyError as key_err:
-        print(f"{Colors.RED}\nError: Missing expected key in API response - {key_err}{Colors.RESET}")
-        print(f"{Colors.YELLOW}Full API response: {json.dumps(response.json(), indent=2) if response else 'No response'}{Colors.RESET}")
+        print(f"{RED}\nError: Missing expected key in API response - {key_err}{RESET}")
+        print(f"{YELLOW}Full API response: {_json_dumps(parsed_response, indent=True).decode('utf-8') if parsed_response is not None else 'No response'}{RESET}")
     except Exception as e:
-        print(f"{Colors.RED}\nAn unexpected error occurred: {e}{Colors.RESET}")
+        print(f"{RED}\nAn unexpected error occurred: {e}{RESET}")
 
 if __name__ == "__main__":
     main()